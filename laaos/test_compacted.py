@@ -1,3 +0,0 @@
-store = (
-{'losses': [1.0, 0.5, 0.3333333333333333, 0.25, 0.2, 0.16666666666666666, 0.14285714285714285, 0.125, 0.1111111111111111]}
-)
@@ -1,8 +1,15 @@
+import array
+import ast
+import atexit
 import dataclasses
+import functools
 import os
 import enum
-import pprint
+import re
+import tokenize
 import typing
+import weakref
+from collections import namedtuple
 from collections.abc import MutableMapping, MutableSequence, MutableSet
 from datetime import datetime
 from io import TextIOBase
@@ -24,7 +31,21 @@ def generate_time_id():
     return "_" + id
 
 
+@functools.lru_cache(maxsize=1024)
+def _type_can_iter(obj_type):
+    # Only look at the MRO: `hasattr` would also find metaclass methods (e.g. `EnumMeta.__iter__`).
+    for slot in ("__iter__", "__getitem__"):
+        for klass in obj_type.__mro__:
+            if slot in vars(klass):
+                return vars(klass)[slot] is not None
+    return False
+
+
 def can_iter(obj):
+    # Most objects that end up here are not iterable, which the type tells us without paying for a raised TypeError.
+    # Types that define `__iter__` still need the real probe: e.g. 0-d tensors and arrays raise in `__iter__`.
+    if not _type_can_iter(type(obj)):
+        return False
     try:
         iter(obj)
     except TypeError:
@@ -33,13 +54,28 @@ def can_iter(obj):
         return True
 
 
+# Immutable types that are stored as-is: they need neither wrapping nor linking. Their `repr` is the builtin one, which
+# is not cached: a cache lookup costs more than `repr` of an int or a short string.
+_SCALAR_TYPES = frozenset((int, float, complex, str, type(None), bool))
+
+# Maximum number of coalesced appends that are written as a single `extend` (see `Store`).
+_MAX_COALESCED_APPENDS = 1024
+
+# Typecodes of the packed arrays that lists only appended ints or floats to are stored in (see `StoreList`). Packing
+# the typical `losses.append(loss)` takes 8 bytes per value instead of a pointer plus a boxed object.
+_ARRAY_TYPECODES = {int: "q", float: "d"}
+
+
 class TypeHandler:
     """
     TypeHandlers extend the behavior of Store to support additional types.
     """
 
     def supports(self, obj):
-        """Whether this type handler supports handling `obj`."""
+        """
+        Whether this type handler supports handling `obj`. This must only depend on `type(obj)`: Store caches the
+        result per type.
+        """
         return False
 
     def wrap(self, obj, wrap):
@@ -135,7 +171,62 @@ DefaultTypeHandlers = [
 ]
 
 
+# Stores that buffer writes in memory or in their log. They are flushed at exit in case they were not closed (stores
+# that are garbage-collected before are flushed by `_flush_dropped_store`).
+_unflushed_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_unflushed_stores():
+    for store in list(_unflushed_stores):
+        if not store._log.closed:
+            store.flush()
+
+
+class _PendingAppends:
+    """Appends to the same list that a Store coalesces into a single `extend` (see `Store.write_append`)."""
+
+    __slots__ = ("accessor", "reprs")
+
+    def __init__(self):
+        self.accessor = None
+        self.reprs = []
+
+    def write(self, log):
+        reprs = self.reprs
+        if len(reprs) == 1:
+            log.write(f"{self.accessor}.append({reprs[0]})\n")
+        else:
+            log.write(f"{self.accessor}.extend([{', '.join(reprs)}])\n")
+        self.accessor = None
+        self.reprs = []
+
+
+def _flush_dropped_store(log, pending_appends):
+    """
+    Finalizer of stores that buffer writes. It only holds on to the log and the pending appends, so they are still
+    intact when the store is garbage-collected (a `__del__` might only run after the log has been finalized).
+    """
+    if not log.closed:
+        if pending_appends.reprs:
+            pending_appends.write(log)
+        log.flush()
+
+
 class Store:
+    __slots__ = (
+        "_type_handlers",
+        "_type_handler_cache",
+        "_log",
+        "_uri",
+        "_auto_flush",
+        "_fsync_on_flush",
+        "_coalesce_appends",
+        "_pending_appends",
+        "_root",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         log: TextIOBase,
@@ -144,6 +235,9 @@ class Store:
         initial_data=None,
         type_handlers=None,
         append_mode=False,
+        auto_flush=True,
+        fsync_on_flush=False,
+        coalesce_appends=False,
     ):
         """
         Create a Store.
@@ -153,6 +247,13 @@ class Store:
         :param initial_data: Initial data for the store dict.
         :param type_handlers: List of type handlers that get called in order
         to wrap and serialize unknown types.
+        :param auto_flush: whether to flush the log after every write. If False, `flush` has to be called at
+        checkpoints (and `close` at the end) to make sure that everything has been written. Stores that have not
+        been closed are flushed when they are garbage-collected or at interpreter exit.
+        :param fsync_on_flush: whether to `os.fsync` the log on every `flush` for durability.
+        :param coalesce_appends: whether to log consecutive appends to the same list as a single `extend`. Pending
+        appends are written before any other write, on `flush` and once there are `_MAX_COALESCED_APPENDS` of them.
+        Until then, they are only kept in memory, even with `auto_flush`: a crash loses them.
         """
         if initial_data is None:
             initial_data = {}
@@ -160,81 +261,281 @@ class Store:
             type_handlers = ()
 
         self._type_handlers: List[TypeHandler] = type_handlers
+        # The first type handler that supports a type (or None) by type.
+        self._type_handler_cache = {}
         self._log = log
         self._uri = uri
+        self._auto_flush = auto_flush
+        self._fsync_on_flush = fsync_on_flush
+        self._coalesce_appends = coalesce_appends
+        self._pending_appends = _PendingAppends()
+        if not auto_flush or coalesce_appends:
+            _unflushed_stores.add(self)
+            weakref.finalize(self, _flush_dropped_store, log, self._pending_appends).atexit = False
 
         wrapped_initial_data = self._wrap(initial_data)
         self._root = StoreRoot(self, wrapped_initial_data)
         StoreAccessible.link(self._root, "store")
 
         if not append_mode:
-            if wrapped_initial_data:
-                Store.write(
-                    self,
-                    f"store = (\n{pprint.pformat(wrapped_initial_data, width=160, compact=True)}\n)",
-                )
-            else:
-                Store.write(self, "store = {}")
+            Store.write_line(self, f"store = {self._repr(wrapped_initial_data)}\n")
 
     @property
     def uri(self):
         return self._uri
 
+    def flush(self):
+        if self._pending_appends.reprs:
+            self._pending_appends.write(self._log)
+        self._log.flush()
+        if self._fsync_on_flush:
+            os.fsync(self._log.fileno())
+
     def close(self):
+        if self._log.closed:
+            return
+        self.flush()
         self._log.close()
+        _unflushed_stores.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def _wrap(self, obj):
+        # Fast path: exact types only need a single set or dict lookup.
+        obj_type = type(obj)
+        if obj_type in _SCALAR_TYPES:
+            return obj
+        wrap_fn = Store._wrap_dispatch.get(obj_type)
+        if wrap_fn is not None:
+            return wrap_fn(self, obj)
+
         if isinstance(obj, (int, float, complex, str, type(None), bool)):
             pass
         elif isinstance(obj, StoreAccessible) and obj._accessor is None:
             pass
         elif isinstance(obj, (list, StoreList)):
-            obj = StoreList(self, [self._wrap(value) for value in obj])
+            obj = self._wrap_list(obj)
         elif isinstance(obj, (dict, StoreDict)):
-            obj = StoreDict(
-                self, {key: self._wrap(value) for key, value in obj.items()}
-            )
+            obj = self._wrap_dict(obj)
         elif isinstance(obj, (set, StoreSet)):
-            obj = StoreSet(self, {self._wrap(value) for value in obj})
+            obj = self._wrap_set(obj)
         elif can_iter(obj):
-            obj = StoreList(self, [self._wrap(value) for value in iter(obj)])
+            obj = self._wrap_list(iter(obj))
         else:
-            for type_handler in self._type_handlers:
-                if type_handler.supports(obj):
-                    return type_handler.wrap(obj, self._wrap)
+            type_handler = self._find_type_handler(obj)
+            if type_handler is not None:
+                return type_handler.wrap(obj, self._wrap)
             raise KeyError(f"{type(obj)} not supported for LAAOS!")
         return obj
 
+    def _wrap_list(self, obj):
+        # Lists of scalars (e.g. losses) need no per-element wrapping.
+        if type(obj) is list and set(map(type, obj)) <= _SCALAR_TYPES:
+            return StoreList(self, obj)
+        # The store collections copy their initial data anyway, so we stream into them without an intermediate copy.
+        return StoreList(self, map(self._wrap, obj))
+
+    def _wrap_dict(self, obj):
+        if type(obj) is dict and set(map(type, obj.values())) <= _SCALAR_TYPES:
+            return StoreDict(self, obj)
+        return StoreDict(self, zip(obj.keys(), map(self._wrap, obj.values())))
+
+    def _wrap_set(self, obj):
+        if type(obj) is set and set(map(type, obj)) <= _SCALAR_TYPES:
+            return StoreSet(self, obj)
+        return StoreSet(self, map(self._wrap, obj))
+
+    # Unlinked store collections (e.g. from `new_list`) are passed through, linked ones are copied. We copy from the
+    # underlying builtin collections, so they take the bulk paths above. Their children have to be linked first, so
+    # they are copied as well instead of being passed through.
+    def _wrap_store_list(self, obj):
+        if obj._accessor is None:
+            return obj
+        if not obj._children_linked:
+            obj._link_children()
+        return self._wrap_list(obj._as_list())
+
+    def _wrap_store_dict(self, obj):
+        if obj._accessor is None:
+            return obj
+        if not obj._children_linked:
+            obj._link_children()
+        return self._wrap_dict(obj._data)
+
+    def _wrap_store_set(self, obj):
+        return obj if obj._accessor is None else self._wrap_set(obj._set)
+
+    def _wrap_and_repr(self, obj):
+        """
+        Wraps `obj` and computes the `repr` of the wrapped object in a single traversal.
+
+        :return: tuple of the wrapped object and its `repr`
+        """
+        obj_type = type(obj)
+        if obj_type in _SCALAR_TYPES:
+            return obj, repr(obj)
+
+        # Linked store collections are copied like their underlying builtin collections (see `_wrap_store_list`).
+        if obj_type is StoreList and obj._accessor is not None:
+            if not obj._children_linked:
+                obj._link_children()
+            obj = obj._as_list()
+            obj_type = list
+        elif (obj_type is StoreDict or obj_type is StoreRoot) and obj._accessor is not None:
+            if not obj._children_linked:
+                obj._link_children()
+            obj = obj._data
+            obj_type = dict
+
+        if obj_type is list:
+            if set(map(type, obj)) <= _SCALAR_TYPES:
+                return StoreList(self, obj), repr(obj)
+            wrapped = StoreList(self, ())
+            values = wrapped._seq
+            value_reprs = []
+            for value in obj:
+                value, value_repr = self._wrap_and_repr(value)
+                values.append(value)
+                value_reprs.append(value_repr)
+            return wrapped, "[" + ", ".join(value_reprs) + "]"
+        elif obj_type is dict:
+            if (
+                set(map(type, obj)) <= _SCALAR_TYPES
+                and set(map(type, obj.values())) <= _SCALAR_TYPES
+            ):
+                return StoreDict(self, obj), repr(obj)
+            wrapped = StoreDict(self, ())
+            data = wrapped._data
+            item_reprs = []
+            for key, value in obj.items():
+                value, value_repr = self._wrap_and_repr(value)
+                data[key] = value
+                item_reprs.append(f"{self._repr(key)}: {value_repr}")
+            return wrapped, "{" + ", ".join(item_reprs) + "}"
+
+        obj = self._wrap(obj)
+        return obj, self._repr(obj)
+
     def _repr(self, obj):
+        # Fast path: exact types only need a single set lookup.
+        if type(obj) in _SCALAR_TYPES:
+            return repr(obj)
+
+        repr_fn = Store._repr_dispatch.get(type(obj))
+        if repr_fn is not None:
+            return repr_fn(self, obj)
+
         if isinstance(obj, (int, float, complex, str, type(None), bool)):
             return repr(obj)
         elif isinstance(obj, (list, StoreList)):
-            return "[" + ", ".join(self._repr(value) for value in obj) + "]"
+            return self._repr_list(obj)
         elif isinstance(obj, (dict, StoreDict)):
-            return (
-                "{"
-                + ", ".join(
-                    f"{self._repr(key)}: {self._repr(value)}"
-                    for key, value in obj.items()
-                )
-                + "}"
-            )
+            return self._repr_dict(obj)
         elif isinstance(obj, (set, StoreSet)):
-            return (
-                "{" + ", ".join(self._repr(value) for value in obj) + "}"
-                if obj
-                else "set()"
-            )
+            return self._repr_set(obj)
         else:
-            for type_handler in self._type_handlers:
-                if type_handler.supports(obj):
-                    return type_handler.repr(obj, self._repr, self)
+            type_handler = self._find_type_handler(obj)
+            if type_handler is not None:
+                return type_handler.repr(obj, self._repr, self)
         return repr(obj)
 
+    def _find_type_handler(self, obj):
+        """:return: the first type handler that supports `obj`, or None"""
+        obj_type = type(obj)
+        if obj_type in self._type_handler_cache:
+            return self._type_handler_cache[obj_type]
+        type_handler = next(
+            (type_handler for type_handler in self._type_handlers if type_handler.supports(obj)), None
+        )
+        self._type_handler_cache[obj_type] = type_handler
+        return type_handler
+
+    def _repr_list(self, obj):
+        # The builtin repr matches ours for scalars and runs entirely in C.
+        if type(obj) is list and set(map(type, obj)) <= _SCALAR_TYPES:
+            return repr(obj)
+        return "[" + ", ".join([self._repr(value) for value in obj]) + "]"
+
+    def _repr_dict(self, obj):
+        if (
+            type(obj) is dict
+            and set(map(type, obj)) <= _SCALAR_TYPES
+            and set(map(type, obj.values())) <= _SCALAR_TYPES
+        ):
+            return repr(obj)
+        return (
+            "{"
+            + ", ".join(
+                [f"{self._repr(key)}: {self._repr(value)}" for key, value in obj.items()]
+            )
+            + "}"
+        )
+
+    def _repr_set(self, obj):
+        if type(obj) is set and set(map(type, obj)) <= _SCALAR_TYPES:
+            return repr(obj)
+        return (
+            "{" + ", ".join([self._repr(value) for value in obj]) + "}"
+            if obj
+            else "set()"
+        )
+
+    def _repr_store_list(self, obj):
+        return self._repr_list(obj._as_list())
+
+    def _repr_store_dict(self, obj):
+        return self._repr_dict(obj._data)
+
+    def _repr_store_set(self, obj):
+        return self._repr_set(obj._set)
+
+    _wrap_dispatch = {
+        list: _wrap_list,
+        dict: _wrap_dict,
+        set: _wrap_set,
+    }
+
+    _repr_dispatch = {
+        list: _repr_list,
+        dict: _repr_dict,
+        set: _repr_set,
+    }
+
+    @staticmethod
+    def write_line(store: "Store", line):
+        """Writes a statement. `line` already ends with a newline, so callers can format it in one go."""
+        if store._pending_appends.reprs:
+            store._pending_appends.write(store._log)
+        store._log.write(line)
+        if store._auto_flush:
+            store.flush()
+
+    @staticmethod
+    def write_append(store: "Store", accessor, obj_repr):
+        if not store._coalesce_appends:
+            Store.write_line(store, f"{accessor}.append({obj_repr})\n")
+            return
+
+        pending_appends = store._pending_appends
+        if accessor != pending_appends.accessor:
+            if pending_appends.reprs:
+                pending_appends.write(store._log)
+            pending_appends.accessor = accessor
+        pending_appends.reprs.append(obj_repr)
+        if len(pending_appends.reprs) >= _MAX_COALESCED_APPENDS:
+            pending_appends.write(store._log)
+            if store._auto_flush:
+                store.flush()
+
+    # `wrap`, `repr` and `write` are kept for backwards compatibility. The store collections call `_wrap`/`_repr`/
+    # `write_line` directly.
     @staticmethod
     def write(store: "Store", text):
-        store._log.write(text + "\n")
-        store._log.flush()
+        Store.write_line(store, text + "\n")
 
     @staticmethod
     def wrap(store: "Store", obj):
@@ -253,6 +554,8 @@ class Store:
 
 
 class StoreAccessible(object):
+    __slots__ = ("_store", "_accessor")
+
     def __init__(self, store: Store):
         self._store = store
         self._accessor = None
@@ -261,21 +564,28 @@ class StoreAccessible(object):
     def laaos_store(self):
         return self._store
 
-    def _check_accessor(self):
-        assert self._accessor is not None, (
+    def _raise_unlinked(self):
+        # Mutators check `self._accessor is None` inline and only call this out-of-line on error.
+        raise AssertionError(
             "You tried to mutate a store collection after it has been unlinked!\n\n"
             "This triggers an exception because it would be too hard to figure out how "
             "to rewrite this into something executable."
         )
 
     def _wrap(self, obj):
-        return Store.wrap(self._store, obj)
+        return self._store._wrap(obj)
 
     def _repr(self, obj):
-        return Store.repr(self._store, obj)
+        return self._store._repr(obj)
+
+    def _wrap_and_repr(self, obj):
+        return self._store._wrap_and_repr(obj)
+
+    def _write_line(self, line):
+        return Store.write_line(self._store, line)
 
-    def _write(self, text):
-        return Store.write(self._store, text)
+    def _write_append(self, obj_repr):
+        return Store.write_append(self._store, self._accessor, obj_repr)
 
     def _unlink(self):
         self._accessor = None
@@ -295,50 +605,101 @@ class StoreAccessible(object):
 
 
 class StoreDict(MutableMapping, StoreAccessible):
+    __slots__ = ("_data", "_children_linked", "_child_accessors", "_child_accessors_base")
+
     def __init__(self, store: Store, initial_data):
         super().__init__(store)
-        self._data = {}
-        self._data.update(initial_data)
+        self._data = dict(initial_data)
+        # Children are only linked once they can be reached (see `_link_children`).
+        self._children_linked = False
+        # Accessors of the children, valid while the dict is linked to `_child_accessors_base`.
+        self._child_accessors = {}
+        self._child_accessors_base = None
 
     def _unlink(self):
         super()._unlink()
-        for value in self._data.values():
-            StoreAccessible.unlink(value)
+        if self._children_linked:
+            for value in self._data.values():
+                StoreAccessible.unlink(value)
 
     def _link(self, accessor):
         super()._link(accessor)
+        if accessor != self._child_accessors_base:
+            self._child_accessors = {}
+            self._child_accessors_base = accessor
+
+        if self._children_linked:
+            self._link_children()
+
+    def _link_children(self):
+        """
+        Links the children. This is deferred until a child is handed out, so e.g. large initial data does not need an
+        accessor for every nested collection. Children only have an accessor while `_children_linked` is set.
+        """
+        self._children_linked = True
+        # Only collections need an accessor; the ones of scalars are built on demand by `_child_accessor`.
         for key, value in self._data.items():
-            StoreAccessible.link(value, f"{self._accessor}[{self._repr(key)}]")
+            if isinstance(value, StoreAccessible):
+                value._link(self._child_accessor(key))
+
+    def _link_child(self, value, accessor):
+        if isinstance(value, StoreAccessible):
+            if self._children_linked:
+                value._link(accessor)
+            else:
+                self._link_children()
+
+    def _child_accessor(self, key):
+        accessor = self._child_accessors.get(key)
+        if accessor is None:
+            accessor = f"{self._accessor}[{self._repr(key)}]"
+            self._child_accessors[key] = accessor
+        return accessor
 
     def __getitem__(self, key: KT) -> VT_co:
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
         return self._data[key]
 
     def __setitem__(self, key: KT, value: VT) -> None:
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
 
         old_value = self._data.get(key, None)
         if old_value is value:
             return
 
+        if type(value) in _SCALAR_TYPES:
+            # Fast path for the common `store['step'] = step`: no wrapping or linking needed.
+            StoreAccessible.unlink(old_value)
+            self._data[key] = value
+            Store.write_line(self._store, f"{self._child_accessor(key)}={repr(value)}\n")
+            return
+
+        # Wrap before unlinking: if `value` contains `old_value`, it has to be copied as well.
+        value, value_repr = self._wrap_and_repr(value)
         StoreAccessible.unlink(old_value)
 
-        value = self._wrap(value)
         self._data[key] = value
-        self._write(f"{self._accessor}[{self._repr(key)}]={self._repr(value)}")
 
-        StoreAccessible.link(value, f"{self._accessor}[{self._repr(key)}]")
+        accessor = self._child_accessor(key)
+        self._write_line(f"{accessor}={value_repr}\n")
+
+        self._link_child(value, accessor)
 
     def __delitem__(self, key: KT) -> None:
         if key not in self._data:
             # Early out with the correct exception
             del self._data[key]
 
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
         StoreAccessible.unlink(self._data.get(key, None))
 
         del self._data[key]
 
-        self._write(f"del {self._accessor}[{self._repr(key)}]")
+        self._write_line(f"del {self._child_accessor(key)}\n")
+        del self._child_accessors[key]
 
     def __len__(self) -> int:
         return len(self._data)
@@ -346,65 +707,225 @@ class StoreDict(MutableMapping, StoreAccessible):
     def __iter__(self) -> Iterator[T_co]:
         return iter(self._data)
 
+    # The Mapping mixins are implemented in Python on top of __getitem__, so we delegate reads to the dict directly.
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def get(self, key: KT, default=None):
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
+        return self._data.get(key, default)
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
+        return self._data.values()
+
+    def items(self):
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
+        return self._data.items()
+
     def __repr__(self) -> str:
         return self._repr(self._data)
 
+    def __eq__(self, other):
+        if isinstance(other, StoreDict):
+            return self._data == other._data
+        return self._data == other
+
 
 class StoreRoot(StoreDict):
+    __slots__ = ()
+
     def __init__(self, store: Store, initial_data):
         super().__init__(store, initial_data)
 
+    def flush(self):
+        return self._store.flush()
+
     def close(self):
         return self._store.close()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @property
     def uri(self):
         return self._store.uri
 
 
 class StoreList(MutableSequence, StoreAccessible):
+    __slots__ = ("_seq", "_array_type", "_children_linked")
+
     def __init__(self, store, seq: list):
         super().__init__(store)
         self._seq = list(seq)
+        # The type of all values if `_seq` is a packed array: an empty list that only ints or only floats are
+        # appended to is stored as an `array.array`. Any other mutation switches it back to a list (see `_use_list`).
+        self._array_type = None
+        # Children are only linked once they can be reached (see `StoreDict._link_children`).
+        self._children_linked = False
+
+    def _use_list(self):
+        self._seq = self._seq.tolist()
+        self._array_type = None
+
+    def _as_list(self):
+        return self._seq if self._array_type is None else self._seq.tolist()
 
     def _unlink(self):
         super()._unlink()
-        for value in self._seq:
-            StoreAccessible.unlink(value)
+        if self._children_linked:
+            for value in self._seq:
+                StoreAccessible.unlink(value)
 
     def _link(self, accessor):
         super()._link(accessor)
-        for key, value in enumerate(self._seq):
-            StoreAccessible.link(value, f"{self._accessor}[{self._repr(key)}]")
+        if self._children_linked:
+            self._relink_from(0)
+
+    def _link_children(self):
+        self._children_linked = True
+        self._relink_from(0)
+
+    def _link_child(self, value, index):
+        if isinstance(value, StoreAccessible):
+            if self._children_linked:
+                value._link(f"{self._accessor}[{index}]")
+            else:
+                self._link_children()
+
+    def _relink_from(self, index):
+        """Relinks all collections from `index` onwards (e.g. after their indices have shifted)."""
+        accessor = self._accessor
+        seq = self._seq
+        for i in range(index, len(seq)):
+            value = seq[i]
+            if isinstance(value, StoreAccessible):
+                value._link(f"{accessor}[{i}]")
 
     def clear(self) -> None:
-        self._check_accessor()
-        for value in self._seq:
-            StoreAccessible.unlink(value)
-        self._seq.clear()
-        self._write(f"{self._accessor}.clear()")
+        if self._accessor is None:
+            self._raise_unlinked()
+        if self._children_linked:
+            for value in self._seq:
+                StoreAccessible.unlink(value)
+        self._seq = []
+        self._array_type = None
+        self._write_line(f"{self._accessor}.clear()\n")
 
     def insert(self, index: int, obj: T) -> None:
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
 
-        obj = self._wrap(obj)
+        obj, obj_repr = self._wrap_and_repr(obj)
+        if self._array_type is not None:
+            self._use_list()
         self._seq.insert(index, obj)
 
-        self._write(f"{self._accessor}.insert({self._repr(index)}, {self._repr(obj)})")
+        # List indices are ints, whose repr is their str, so we can format them directly.
+        self._write_line(f"{self._accessor}.insert({index}, {obj_repr})\n")
 
-        for i in range(index, len(self._seq)):
-            StoreAccessible.link(self._seq[i], f"{self._accessor}[{i}]")
+        if self._children_linked:
+            self._relink_from(index)
+        elif isinstance(obj, StoreAccessible):
+            self._link_children()
 
     def append(self, obj: T) -> None:
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
+
+        obj_type = type(obj)
+        if obj_type in _SCALAR_TYPES:
+            # Fast path for the common `losses.append(loss)`: no wrapping and no helper frames.
+            array_type = self._array_type
+            if array_type is not obj_type:
+                if array_type is not None:
+                    self._use_list()
+                elif not self._seq and obj_type in _ARRAY_TYPECODES:
+                    self._seq = array.array(_ARRAY_TYPECODES[obj_type])
+                    self._array_type = obj_type
+            try:
+                self._seq.append(obj)
+            except OverflowError:
+                # An int that does not fit into 64 bits.
+                self._use_list()
+                self._seq.append(obj)
+            Store.write_append(self._store, self._accessor, repr(obj))
+            return
 
-        obj = self._wrap(obj)
+        obj, obj_repr = self._wrap_and_repr(obj)
+        if self._array_type is not None:
+            self._use_list()
         self._seq.append(obj)
 
-        self._write(f"{self._accessor}.append({self._repr(obj)})")
-        StoreAccessible.link(obj, f"{self._accessor}[{len(self._seq)-1}]")
+        self._write_append(obj_repr)
+        self._link_child(obj, len(self._seq) - 1)
+
+    def extend(self, values) -> None:
+        """
+        Appends all `values` and logs them as a single `extend` statement instead of one `append` per value. The
+        statement is written (and replayed) as a whole, so a crash cannot leave only some of the values in the log.
+        """
+        if self._accessor is None:
+            self._raise_unlinked()
+
+        values = list(values)
+        if not values:
+            return
+
+        value_types = set(map(type, values))
+        if value_types <= _SCALAR_TYPES:
+            values_repr = repr(values)
+        else:
+            wrapped_values, values_repr = self._wrap_and_repr(values)
+            values = wrapped_values._seq
+
+        start = len(self._seq)
+        self._extend_seq(values, value_types)
+
+        self._write_line(f"{self._accessor}.extend({values_repr})\n")
+
+        if self._children_linked:
+            self._relink_from(start)
+        elif not value_types <= _SCALAR_TYPES:
+            self._link_children()
+
+    def _extend_seq(self, values, value_types):
+        """Extends `_seq` and keeps it (or starts it off as) a packed array if all `values` have its type."""
+        array_type = self._array_type
+        if array_type is None and not self._seq and len(value_types) == 1:
+            (array_type,) = value_types
+        if array_type in _ARRAY_TYPECODES and value_types == {array_type}:
+            try:
+                packed_values = array.array(_ARRAY_TYPECODES[array_type], values)
+            except OverflowError:
+                pass
+            else:
+                if self._array_type is None:
+                    self._seq = packed_values
+                    self._array_type = array_type
+                else:
+                    self._seq.extend(packed_values)
+                return
+
+        if self._array_type is not None:
+            self._use_list()
+        self._seq.extend(values)
 
     def __getitem__(self, key) -> T:
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
+        if self._array_type is not None and type(key) is slice:
+            # Slices of packed arrays are arrays.
+            return self._seq[key].tolist()
         return self._seq[key]
 
     def __setitem__(self, key, value) -> None:
@@ -418,19 +939,23 @@ class StoreList(MutableSequence, StoreAccessible):
         if key < 0:
             key += len(self._seq)
 
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
 
         old_value = self._seq[key]
         if old_value is value:
             return
 
+        # Wrap before unlinking: if `value` contains `old_value`, it has to be copied as well.
+        value, value_repr = self._wrap_and_repr(value)
         StoreAccessible.unlink(old_value)
 
-        value = self._wrap(value)
+        if self._array_type is not None:
+            self._use_list()
         self._seq[key] = value
 
-        self._write(f"{self._accessor}[{self._repr(key)}] = {self._repr(value)}")
-        StoreAccessible.link(value, f"{self._accessor}[{self._repr(key)}]")
+        self._write_line(f"{self._accessor}[{key}] = {value_repr}\n")
+        self._link_child(value, key)
 
     def __delitem__(self, key) -> None:
         if not -len(self._seq) <= key < len(self._seq):
@@ -440,43 +965,71 @@ class StoreList(MutableSequence, StoreAccessible):
         if key < 0:
             key += len(self._seq)
 
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
 
         StoreAccessible.unlink(self._seq[key])
         del self._seq[key]
-        Store.write(self._store, f"del {self._accessor}[{self._repr(key)}]")
+        self._write_line(f"del {self._accessor}[{key}]\n")
 
-        for i in range(key, len(self._seq)):
-            StoreAccessible.link(self._seq[i], f"{self._accessor}[{i}]")
+        if self._children_linked:
+            self._relink_from(key)
 
     def __len__(self) -> int:
         return len(self._seq)
 
+    # The Sequence mixins are implemented in Python on top of __getitem__, so we delegate reads to the list directly.
+    def __iter__(self) -> Iterator[T_co]:
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
+        return iter(self._seq)
+
+    def __reversed__(self) -> Iterator[T_co]:
+        if not self._children_linked and self._accessor is not None:
+            self._link_children()
+        return reversed(self._seq)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._seq
+
+    def index(self, value, start=0, stop=None) -> int:
+        if stop is None:
+            stop = len(self._seq)
+        # `array.index` only takes `start` and `stop` from Python 3.10 on.
+        return self._as_list().index(value, start, stop)
+
+    def count(self, value) -> int:
+        return self._seq.count(value)
+
     def __repr__(self) -> str:
-        return self._repr(self._seq)
+        return self._repr(self._as_list())
 
     def __eq__(self, other):
         if isinstance(other, StoreList):
-            return self._seq == other._seq
-        return self._seq == other
+            return self._as_list() == other._as_list()
+        return self._as_list() == other
 
 
 class StoreSet(MutableSet, StoreAccessible):
+    __slots__ = ("_set",)
+
     def __init__(self, store: Store, initial_data):
         super().__init__(store)
         self._set = set(initial_data)
 
     def add(self, x: T) -> None:
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
 
         self._set.add(x)
-        self._write(f"{self._accessor}.add({self._repr(x)})")
+        self._write_line(f"{self._accessor}.add({self._repr(x)})\n")
 
     def discard(self, x: T) -> None:
-        self._check_accessor()
+        if self._accessor is None:
+            self._raise_unlinked()
 
         self._set.discard(x)
-        self._write(f"{self._accessor}.discard({self._repr(x)})")
+        self._write_line(f"{self._accessor}.discard({self._repr(x)})\n")
 
     def __contains__(self, x: object) -> bool:
         return x in self._set
@@ -491,6 +1044,25 @@ class StoreSet(MutableSet, StoreAccessible):
         return self._repr(self._set)
 
 
+# Store collections are only defined after Store, so we register them here.
+Store._wrap_dispatch.update(
+    {
+        StoreList: Store._wrap_store_list,
+        StoreDict: Store._wrap_store_dict,
+        StoreRoot: Store._wrap_store_dict,
+        StoreSet: Store._wrap_store_set,
+    }
+)
+Store._repr_dispatch.update(
+    {
+        StoreList: Store._repr_store_list,
+        StoreDict: Store._repr_store_dict,
+        StoreRoot: Store._repr_store_dict,
+        StoreSet: Store._repr_store_set,
+    }
+)
+
+
 def ensure_dirs(filename):
     abs_path = os.path.abspath(filename)
     abs_dir = os.path.dirname(abs_path)
@@ -508,6 +1080,9 @@ def open_file_store(
     type_handlers=None,
     exposed_symbols=None,
     extra_mappings=None,
+    auto_flush=True,
+    fsync_on_flush=False,
+    coalesce_appends=False,
 ) -> StoreRoot:
     """
     Opens a file store. Either truncates any existing store in the same file, or otherwise loads an existing store to
@@ -530,23 +1105,35 @@ def open_file_store(
     :param type_handlers: type handlers for the store
     :param exposed_symbols: exposed symbols for the store (see `load_safe_str`)
     :param extra_mappings: extra symbol mappings for the store (see `load_safe_str`)
+    :param auto_flush: whether to flush after every write (see `Store`)
+    :param fsync_on_flush: whether to `os.fsync` on every flush (see `Store`)
+    :param coalesce_appends: whether to log consecutive appends as a single `extend`; pending appends are not covered
+    by `auto_flush` (see `Store`)
     """
     if suffix is None:
         suffix = generate_time_id()
 
     filename = f"{prefix}{store_name}{suffix}{ext}"
     ensure_dirs(filename)
-    log = open(filename, "a+t" if not truncate else "wt")
+    # Without auto flushing, we rely on a larger write buffer to batch writes. Logs are Python source, so they are UTF-8
+    # (which also has a fast path in TextIOWrapper).
+    log = open(
+        filename,
+        "a+t" if not truncate else "wt",
+        buffering=-1 if auto_flush else 1 << 16,
+        encoding="utf-8",
+    )
 
     if not truncate:
         log.seek(0)
-        existing_code = log.read()
+        has_existing_code = bool(log.read(1))
+        log.seek(0)
     else:
-        existing_code = None
+        has_existing_code = False
 
-    if existing_code:
-        existing_store = safe_load_str(
-            existing_code,
+    if has_existing_code:
+        existing_store = safe_load_lines(
+            log,
             exposed_symbols=exposed_symbols,
             extra_mappings=extra_mappings,
         )
@@ -561,11 +1148,157 @@ def open_file_store(
         initial_data=existing_store,
         type_handlers=type_handlers,
         append_mode=append_mode,
+        auto_flush=auto_flush,
+        fsync_on_flush=fsync_on_flush,
+        coalesce_appends=coalesce_appends,
     )
     return store.root
 
 
-def safe_load_str(code: str, exposed_symbols=None, extra_mappings=None):
+# Methods that a Store emits into its log (see StoreList and StoreSet).
+_LOGGED_METHODS = frozenset(("append", "insert", "extend", "clear", "add", "discard"))
+
+# Python < 3.9 wraps subscript keys in ast.Index.
+_AST_INDEX = getattr(ast, "Index", ())
+
+
+def _eval_literal(node):
+    if isinstance(node, _AST_INDEX):
+        node = node.value
+    # Most logged values are plain constants, which do not need the full `literal_eval` walk.
+    if type(node) is ast.Constant:
+        return node.value
+    return ast.literal_eval(node)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_accessor(accessor):
+    """Parses an accessor of a fast-path statement. Logs mostly use the same few, so they are cached."""
+    return ast.parse(accessor, mode="eval").body
+
+
+def _eval_accessor(node, root):
+    """Evaluates an accessor like `store['losses'][0]` against `root`."""
+    if isinstance(node, ast.Name):
+        return root[node.id]
+    elif isinstance(node, ast.Subscript):
+        return _eval_accessor(node.value, root)[_eval_literal(node.slice)]
+    raise ValueError(f"Unsupported accessor {ast.dump(node)}!")
+
+
+def _replay_statement(node, root) -> bool:
+    """
+    Replays a statement of the log grammar directly on `root` without compiling it.
+
+    :return: False if the statement is not part of the grammar or contains non-literals, so it needs to be `exec`-ed
+    """
+    try:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            value = _eval_literal(node.value)
+            if isinstance(target, ast.Name):
+                root[target.id] = value
+                return True
+            elif isinstance(target, ast.Subscript):
+                container = _eval_accessor(target.value, root)
+                key = _eval_literal(target.slice)
+                container[key] = value
+                return True
+        elif (
+            isinstance(node, ast.Expr)
+            and isinstance(node.value, ast.Call)
+            and isinstance(node.value.func, ast.Attribute)
+            and node.value.func.attr in _LOGGED_METHODS
+            and not node.value.keywords
+        ):
+            call = node.value
+            args = [_eval_literal(arg) for arg in call.args]
+            method = getattr(_eval_accessor(call.func.value, root), call.func.attr)
+            method(*args)
+            return True
+        elif (
+            isinstance(node, ast.Delete)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Subscript)
+        ):
+            target = node.targets[0]
+            container = _eval_accessor(target.value, root)
+            key = _eval_literal(target.slice)
+            del container[key]
+            return True
+    except (ValueError, TypeError, KeyError, AttributeError, IndexError, SyntaxError):
+        # Let exec deal with it (and raise the proper exception if the log is broken).
+        pass
+    return False
+
+
+# A `<accessor>.<method>(<literal>)` line for the single-argument methods below and a `<accessor>[<key>]=<literal>`
+# line (by far the most common in logs), which are replayed without parsing the whole line.
+_LoggedCall = namedtuple("_LoggedCall", ["accessor", "method", "value", "source"])
+_LoggedSetItem = namedtuple("_LoggedSetItem", ["accessor", "key", "value", "source"])
+
+# The method calls that have a fast path and the container types they apply to.
+_FAST_CALL_TYPES = {"append": list, "add": set, "discard": set}
+# Classifies a line in a single match. The accessor is matched lazily, so the first call wins, as in a Python
+# statement; if the argument is not a scalar literal, the line is parsed like any other. Strings without quotes or
+# escapes (the common case) are taken verbatim.
+_LOGGED_CALL_RE = re.compile(
+    r"(?P<accessor>.+?)\.(?P<method>append|add|discard)\((?:'(?P<plain_str>[^'\\]*)'|(?P<value>.*))\)\s*"
+)
+# Only string and int keys (as logged by StoreDict and StoreList) are matched; StoreList writes spaces around `=`.
+_LOGGED_SETITEM_RE = re.compile(
+    r"(?P<accessor>.+?)\[(?:'(?P<str_key>[^'\\]*)'|(?P<int_key>0|[1-9][0-9]*))\] ?= ?"
+    r"(?:'(?P<plain_str>[^'\\]*)'|(?P<value>.*))\s*"
+)
+_NUMBER_RE = re.compile(r"-?[0-9]+(\.[0-9]*)?([eE][-+]?[0-9]+)?")
+_NAMED_CONSTANTS = {"None": None, "True": True, "False": False}
+_NOT_A_LITERAL = object()
+
+
+def _parse_scalar_literal(source):
+    """Parses numbers, strings and named constants quickly. :return: `_NOT_A_LITERAL` for anything else"""
+    match = _NUMBER_RE.fullmatch(source)
+    if match is not None:
+        number = match.group()
+        return int(number) if match.lastindex is None else float(number)
+    if source in _NAMED_CONSTANTS:
+        return _NAMED_CONSTANTS[source]
+    if source[:1] in ("'", '"'):
+        try:
+            value = ast.literal_eval(source)
+        except (ValueError, SyntaxError):
+            return _NOT_A_LITERAL
+        # Rules out e.g. `'a', 'b'`, which is a tuple.
+        if type(value) is str:
+            return value
+    return _NOT_A_LITERAL
+
+
+def _parse_logged_statement(line):
+    """:return: a `_LoggedCall` or `_LoggedSetItem` if `line` is a fast-path statement, None otherwise"""
+    match = _LOGGED_CALL_RE.fullmatch(line)
+    if match is not None:
+        accessor, method, value, value_source = match.groups()
+        if value is None:
+            value = _parse_scalar_literal(value_source)
+            if value is _NOT_A_LITERAL:
+                return None
+        return _LoggedCall(accessor, method, value, line.rstrip())
+
+    match = _LOGGED_SETITEM_RE.fullmatch(line)
+    if match is not None:
+        accessor, key, int_key, value, value_source = match.groups()
+        if key is None:
+            key = int(int_key)
+        if value is None:
+            value = _parse_scalar_literal(value_source)
+            if value is _NOT_A_LITERAL:
+                return None
+        return _LoggedSetItem(accessor, key, value, line.rstrip())
+    return None
+
+
+def _replay(statements, exposed_symbols=None, extra_mappings=None):
     global_symbols = dict(__builtins__=dict(set=set))
 
     if exposed_symbols is not None:
@@ -575,14 +1308,122 @@ def safe_load_str(code: str, exposed_symbols=None, extra_mappings=None):
         global_symbols.update(extra_mappings)
 
     root = dict()
-    exec(code, global_symbols, root)
+    # Containers that fast-path statements resolved to. Only statements that replace or remove a container can change
+    # what an accessor refers to.
+    targets = {}
+    for statement in statements:
+        statement_type = type(statement)
+        if statement_type is _LoggedCall or statement_type is _LoggedSetItem:
+            target = targets.get(statement.accessor)
+            if target is None:
+                try:
+                    target = _eval_accessor(_parse_accessor(statement.accessor), root)
+                except (ValueError, TypeError, KeyError, IndexError, SyntaxError):
+                    pass
+                else:
+                    targets[statement.accessor] = target
+            if statement_type is _LoggedCall:
+                if type(target) is _FAST_CALL_TYPES[statement.method]:
+                    getattr(target, statement.method)(statement.value)
+                    continue
+            elif type(target) is dict or (
+                type(target) is list and type(statement.key) is int and statement.key < len(target)
+            ):
+                key = statement.key
+                replaced_value = target.get(key) if type(target) is dict else target[key]
+                target[key] = statement.value
+                if type(replaced_value) not in _SCALAR_TYPES:
+                    targets.clear()
+                continue
+            # Not a plain container: replay it like any other statement (which also raises the proper exception).
+            sub_statements = ast.parse(statement.source).body
+        else:
+            sub_statements = (statement,)
+
+        targets.clear()
+        for sub_statement in sub_statements:
+            if not _replay_statement(sub_statement, root):
+                module = ast.Module(body=[sub_statement], type_ignores=[])
+                exec(compile(module, "<laaos>", "exec"), global_symbols, root)
     return root["store"]
 
 
+def _read_statement(first_line, readline):
+    """
+    Reads a statement that spans multiple lines (like the pprint-ed initial data of older logs).
+
+    :return: the source of the statement and the lines that the tokenizer has read past it
+    """
+    read_lines = []
+
+    def tracked_readline():
+        line = readline() if read_lines else first_line
+        read_lines.append(line)
+        return line
+
+    end_row = None
+    try:
+        for token in tokenize.generate_tokens(tracked_readline):
+            if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                end_row = token.end[0]
+                break
+    except tokenize.TokenError:
+        # Unterminated statement: ast.parse will raise a proper SyntaxError.
+        pass
+
+    if end_row is None:
+        end_row = len(read_lines)
+    return "".join(read_lines[:end_row]), read_lines[end_row:]
+
+
+def _iter_statements(lines):
+    """Parses the statements of a log line by line, so the whole log never needs to be held in memory."""
+    lines = iter(lines)
+    pushed_back_lines = []
+
+    def readline():
+        if pushed_back_lines:
+            return pushed_back_lines.pop()
+        return next(lines, "")
+
+    while True:
+        line = readline()
+        if not line:
+            return
+        logged_statement = _parse_logged_statement(line)
+        if logged_statement is not None:
+            yield logged_statement
+            continue
+        try:
+            statements = ast.parse(line).body
+        except SyntaxError:
+            source, lines_past_statement = _read_statement(line, readline)
+            statements = ast.parse(source).body
+            pushed_back_lines.extend(reversed(lines_past_statement))
+        yield from statements
+
+
+def safe_load_str(code: str, exposed_symbols=None, extra_mappings=None):
+    return safe_load_lines(
+        code.splitlines(keepends=True),
+        exposed_symbols=exposed_symbols,
+        extra_mappings=extra_mappings,
+    )
+
+
+def safe_load_lines(lines, exposed_symbols=None, extra_mappings=None):
+    """Like `safe_load_str` but parses an iterable of lines (e.g. an open file) lazily."""
+    return _replay(
+        _iter_statements(lines),
+        exposed_symbols=exposed_symbols,
+        extra_mappings=extra_mappings,
+    )
+
+
 def safe_load(path: str, exposed_symbols=None, extra_mappings=None):
-    with open(path, "rt") as file:
-        return safe_load_str(
-            file.read(), exposed_symbols=exposed_symbols, extra_mappings=extra_mappings
+    with open(path, "rt", encoding="utf-8") as file:
+        return safe_load_lines(
+            file, exposed_symbols=exposed_symbols, extra_mappings=extra_mappings
         )
 
 
@@ -590,7 +1431,7 @@ def compact(source_path: str, destination_path: str):
     source_store = safe_load(source_path)
 
     ensure_dirs(destination_path)
-    destination = open(destination_path, "wt")
+    destination = open(destination_path, "wt", encoding="utf-8")
     destination_store = Store(destination, uri=source_path, initial_data=source_store)
     destination_store.close()
 
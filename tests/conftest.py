@@ -0,0 +1,48 @@
+import pytest
+
+from laaos import Store
+
+
+class _ListSink:
+    """In-memory log whose `write` is a bound `list.append`, which is cheaper than `io.StringIO.write`."""
+
+    def __init__(self):
+        self._chunks = []
+        self.write = self._chunks.append
+        self.closed = False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def getvalue(self):
+        return "".join(self._chunks)
+
+
+@pytest.fixture
+def create_memory_store():
+    """
+    Creates memory stores: `create_memory_store(initial_data=None, type_handlers=None)` returns the store root and its
+    log. Stores that the test does not close are closed afterwards (even if the test fails).
+    """
+    logs_and_stores = []
+
+    def create(initial_data=None, type_handlers=None):
+        code = _ListSink()
+        store = Store(code, initial_data=initial_data, type_handlers=type_handlers)
+        logs_and_stores.append((code, store))
+        return store.root, code
+
+    yield create
+
+    for code, store in logs_and_stores:
+        if not code.closed:
+            store.close()
+
+
+@pytest.fixture
+def mem_store(create_memory_store):
+    """An empty memory store and its log."""
+    return create_memory_store()
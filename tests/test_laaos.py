@@ -1,12 +1,16 @@
+import ast
+import gc
 import os
 
 import pytest
 import enum
 import io
+import laaos
 from laaos import (
     Store,
     safe_load_str,
     safe_load,
+    safe_load_lines,
     compact,
     new_dict,
     new_list,
@@ -17,19 +21,13 @@ from laaos import (
 )
 
 
-def create_memory_store(initial_data=None, type_handlers=None):
-    code = io.StringIO()
-    store = Store(code, initial_data=initial_data, type_handlers=type_handlers)
-    return store.root, code
-
+def test_creation(mem_store):
+    store, code = mem_store
+    assert code.getvalue() == "store = {}\n"
 
-def test_creation():
-    store, _ = create_memory_store()
-    store.close()
 
-
-def test_root_map():
-    store, code = create_memory_store()
+def test_root_map(mem_store):
+    store, code = mem_store
     store["test"] = 1
     assert store["test"] == 1
     del store["test"]
@@ -40,38 +38,31 @@ def test_root_map():
     assert len(store) == 1
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
-
-    store.close()
 
 
-def test_root_map_initial_data():
+def test_root_map_initial_data(create_memory_store):
     store, code = create_memory_store(dict(a=2, b=3))
     assert store["a"] == 2
     assert store["b"] == 3
     assert "c" not in store
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
     store.close()
 
 
-def test_map():
-    store, code = create_memory_store()
+def test_map(mem_store):
+    store, code = mem_store
     store["test"] = dict(a=2, b=3)
     assert store["test"] == dict(a=2, b=3)
     del store["test"]["a"]
     assert "a" not in store["test"]
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
-
-    store.close()
 
 
-def test_list():
-    store, code = create_memory_store()
+def test_list(mem_store):
+    store, code = mem_store
     store["list"] = [1, 2, 3]
     assert store["list"] == [1, 2, 3]
 
@@ -83,13 +74,27 @@ def test_list():
     assert store["list"] == [2, 3, 5]
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
-    store.close()
 
+def test_list_bulk(mem_store):
+    store, code = mem_store
+    store["list"] = list(range(1000))
+    log_size = len(code.getvalue())
+
+    # Appends only log the new value, not the whole list.
+    store["list"].append(1000)
+    assert len(code.getvalue()) - log_size < 50
+
+    store["list"] = list(store["list"]) + [1001]
+    store["list"].extend(range(1002, 2000))
 
-def test_list_clear():
-    store, code = create_memory_store()
+    assert len(code.getvalue().splitlines()) == 5
+    assert store["list"] == list(range(2000))
+    assert store == safe_load_str(code.getvalue())
+
+
+def test_list_clear(mem_store):
+    store, code = mem_store
     store["list"] = [1, 2, 3]
     assert store["list"] == [1, 2, 3]
 
@@ -97,13 +102,10 @@ def test_list_clear():
     assert len(store["list"]) == 0
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
-    store.close()
 
-
-def test_set():
-    store, code = create_memory_store()
+def test_set(mem_store):
+    store, code = mem_store
     store["set"] = {1, 2, 3}
     assert store["set"] == {1, 2, 3}
 
@@ -116,23 +118,18 @@ def test_set():
     assert 5 not in store["set"]
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
-    store.close()
 
-
-def test_raise_on_slice():
-    store, code = create_memory_store()
+def test_raise_on_slice(mem_store):
+    store, code = mem_store
     store["list"] = [1, 2, 3]
 
     with pytest.raises(AssertionError):
         store["list"][0:1] = [[1]]
 
-    store.close()
-
 
-def test_raise_after_unlink():
-    store, code = create_memory_store()
+def test_raise_after_unlink(mem_store):
+    store, code = mem_store
     store["list"] = [1, 2, 3]
 
     the_list = store["list"]
@@ -144,8 +141,8 @@ def test_raise_after_unlink():
         the_list.append(6)
 
 
-def test_del_unknown():
-    store, code = create_memory_store()
+def test_del_unknown(mem_store):
+    store, code = mem_store
     store["list"] = []
 
     with pytest.raises(IndexError):
@@ -154,39 +151,35 @@ def test_del_unknown():
     with pytest.raises(KeyError):
         del store["set"]
 
-    store.close()
-
 
-def test_list_set_unknown():
-    store, code = create_memory_store()
+def test_list_set_unknown(mem_store):
+    store, code = mem_store
     store["list"] = []
 
     with pytest.raises(IndexError):
         store["list"][1] = 1
 
 
-def test_nested_lists():
+def test_nested_lists(create_memory_store):
     store, code = create_memory_store(dict(lists=[[[]]]))
     store["lists"][0][0].append(1)
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
     store.close()
 
 
-def test_nested_list_append():
+def test_nested_list_append(create_memory_store):
     store, code = create_memory_store(dict(lists=[]))
     store["lists"].append([])
     store["lists"][0].append(1)
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
     store.close()
 
 
-def test_nested_list_insert():
+def test_nested_list_insert(create_memory_store):
     store, code = create_memory_store(dict(lists=[]))
     store["lists"].insert(0, [])
     store["lists"][0].append(1)
@@ -198,12 +191,11 @@ def test_nested_list_insert():
     store["lists"][3].append(4)
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
     store.close()
 
 
-def test_nested_list_del():
+def test_nested_list_del(create_memory_store):
     store, code = create_memory_store(dict(lists=[]))
     store["lists"].extend([[], [], [], []])
     store["lists"][0].append(1)
@@ -216,13 +208,12 @@ def test_nested_list_del():
     store["lists"][1].append(6)
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
     store.close()
 
 
-def test_fail_on_chained_assignment():
-    store, code = create_memory_store()
+def test_fail_on_chained_assignment(mem_store):
+    store, code = mem_store
     a = store["list"] = []
     a.append(1)
 
@@ -230,11 +221,9 @@ def test_fail_on_chained_assignment():
     assert store["list"] == []
     assert a != store["list"]
 
-    store.close()
 
-
-def test_list_duplicate_on_multiple_assignments():
-    store, code = create_memory_store()
+def test_list_duplicate_on_multiple_assignments(mem_store):
+    store, code = mem_store
 
     store["list"] = [1, 2]
     store["list2"] = store["list"]
@@ -243,26 +232,20 @@ def test_list_duplicate_on_multiple_assignments():
     assert 3 not in store["list2"]
     assert store["list"] != store["list2"]
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
-
-    store.close()
 
 
-def test_map_duplicate_on_multiple_assignments():
-    store, code = create_memory_store()
+def test_map_duplicate_on_multiple_assignments(mem_store):
+    store, code = mem_store
 
     store["dict"] = dict(a=1)
     store["dict2"] = store["dict"]
     store["dict"]["b"] = 2
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
-    store.close()
 
-
-def test_relink_works():
-    store, code = create_memory_store()
+def test_relink_works(mem_store):
+    store, code = mem_store
 
     store["dict"] = dict(a=1)
     a = store["dict"]
@@ -273,22 +256,21 @@ def test_relink_works():
     store["dict2"]["b"] = 2
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
-    store.close()
 
+def test_compaction(tmp_path):
+    compacted_path = str(tmp_path / "test_compacted.py")
+    compact("./laaos/test.py", compacted_path)
 
-def test_compaction():
-    compact("./laaos/test.py", "./laaos/test_compacted.py")
+    with open(compacted_path, encoding="utf-8") as file:
+        assert len(ast.parse(file.read()).body) == 1
+    assert safe_load(compacted_path) == safe_load("./laaos/test.py")
 
 
 def test_create_file_store():
-    store = open_file_store("test_create", suffix="", truncate=True)
-
-    store["list"] = [1, 2]
-    store["dict"] = dict(a=5, b=6)
-
-    store.close()
+    with open_file_store("test_create", suffix="", truncate=True) as store:
+        store["list"] = [1, 2]
+        store["dict"] = dict(a=5, b=6)
 
     loaded_store = safe_load("./laaos/test_create.py")
 
@@ -296,41 +278,37 @@ def test_create_file_store():
 
 
 def test_append_file_store_edge_case():
-    open("./laaos/test_append_edge.py", "w+")
+    with open("./laaos/test_append_edge.py", "w+"):
+        pass
 
-    store = open_file_store("test_append_edge", suffix="")
-    store.close()
+    with open_file_store("test_append_edge", suffix=""):
+        pass
 
     safe_load("./laaos/test_append_edge.py")
 
 
 def test_append_file_store():
-    open("./laaos/test_append.py", "w")
+    with open("./laaos/test_append.py", "w"):
+        pass
     os.remove("./laaos/test_append.py")
 
-    store = open_file_store("test_append", suffix="")
+    with open_file_store("test_append", suffix="") as store:
+        store["list"] = [1, 2]
+        store["dict"] = dict(a=5, b=6)
 
-    store["list"] = [1, 2]
-    store["dict"] = dict(a=5, b=6)
+    with open_file_store("test_append", suffix="") as new_store:
+        assert store == new_store
 
-    store.close()
-
-    new_store = open_file_store("test_append", suffix="")
-
-    assert store == new_store
-
-    new_store["list"].append(3)
-    new_store["dict"]["c"] = 10
-
-    new_store.close()
+        new_store["list"].append(3)
+        new_store["dict"]["c"] = 10
 
     final_store = safe_load("./laaos/test_append.py")
 
     assert new_store == final_store
 
 
-def test_can_passthrough_dict():
-    store, code = create_memory_store()
+def test_can_passthrough_dict(mem_store):
+    store, code = mem_store
 
     d = new_dict(store, "dict")
     d["a"] = 1
@@ -338,11 +316,10 @@ def test_can_passthrough_dict():
     assert store["dict"]["a"] == 1
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
 
-def test_can_passthrough_list():
-    store, code = create_memory_store()
+def test_can_passthrough_list(mem_store):
+    store, code = mem_store
 
     l = new_list(store, "list")
     l.append(1)
@@ -350,11 +327,10 @@ def test_can_passthrough_list():
     assert store["list"] == [1]
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
 
-def test_can_passthrough_set():
-    store, code = create_memory_store()
+def test_can_passthrough_set(mem_store):
+    store, code = mem_store
 
     s = new_set(store, "set")
     s.add(1)
@@ -362,10 +338,9 @@ def test_can_passthrough_set():
     assert store["set"] == {1}
 
     assert store == safe_load_str(code.getvalue())
-    assert repr(store) == repr(safe_load_str(code.getvalue()))
 
 
-def test_enum_str_handler():
+def test_enum_str_handler(create_memory_store):
     class A(enum.Enum):
         a = 1
         b = 2
@@ -383,10 +358,379 @@ class B(enum.Enum):
     b = 2
 
 
-def test_enum_weak_handler():
+def test_enum_weak_handler(create_memory_store):
     store, code = create_memory_store(type_handlers=[WeakEnumHandler()])
 
     store[B.a] = B.b
 
     loaded = safe_load_str(code.getvalue(), exposed_symbols=[B])
     assert loaded == store
+
+
+def test_type_handler_lookup_is_cached_per_type(create_memory_store):
+    class CountingHandler(StrEnumHandler):
+        calls = 0
+
+        def supports(self, obj):
+            CountingHandler.calls += 1
+            return super().supports(obj)
+
+    store, code = create_memory_store(type_handlers=[CountingHandler()])
+
+    for _ in range(3):
+        store["a"] = B.a
+        store["b"] = B.b
+
+    assert CountingHandler.calls == 1
+    assert safe_load_str(code.getvalue()) == {"a": "B.a", "b": "B.b"}
+
+    store.close()
+
+
+class FakeTensor:
+    """Iterates like a torch.Tensor: into 0-d tensors, which raise a TypeError in `__iter__`."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __iter__(self):
+        if not isinstance(self.values, list):
+            raise TypeError("iteration over a 0-d tensor")
+        return map(FakeTensor, self.values)
+
+    def tolist(self):
+        return self.values
+
+
+class FakeTensorHandler(laaos.TypeHandler):
+    def supports(self, obj):
+        return isinstance(obj, FakeTensor)
+
+    def wrap(self, obj, wrap):
+        return obj.tolist()
+
+
+def test_type_handler_for_types_whose_iter_raises(create_memory_store):
+    store, code = create_memory_store(type_handlers=[FakeTensorHandler()])
+    store["tensor"] = FakeTensor([1.0, 2.0])
+
+    assert code.getvalue() == "store = {}\nstore['tensor']=[1.0, 2.0]\n"
+
+
+def test_manual_flush_file_store(tmp_path):
+    with open_file_store(
+        "test_manual_flush", suffix="", prefix=f"{tmp_path}/", truncate=True, auto_flush=False
+    ) as store:
+        store["list"] = [1, 2]
+        store["list"].append(3)
+
+        store.flush()
+        assert store == safe_load(f"{tmp_path}/test_manual_flush.py")
+
+        store["dict"] = dict(a=5)
+
+    assert store == safe_load(f"{tmp_path}/test_manual_flush.py")
+
+
+def test_repr_distinguishes_equal_scalars(mem_store):
+    store, code = mem_store
+    store["list"] = [1, True, 1.0, 0.0, -0.0]
+    store["list"].append(True)
+    store["list"].append(-0.0)
+    store["nested"] = dict(set={1, 2.0}, list=[dict(a=1.0, b=True)], empty=set())
+
+    assert repr(store) == repr(safe_load_str(code.getvalue()))
+
+
+def test_safe_load_str_falls_back_to_exec():
+    code = "store = {}\nstore['a'] = set()\nstore['a'].add(1)\nstore['b'] = [0] * 3\nstore['b'].append(3)\n"
+    assert safe_load_str(code) == dict(a={1}, b=[0, 0, 0, 3])
+
+
+def test_safe_load_lines_multiline_initial_data(create_memory_store):
+    initial_data = dict(losses=list(range(100)), names={f"name{i}": "(" * i for i in range(10)})
+    store, code = create_memory_store(initial_data)
+    store["losses"].append(100)
+    store["names"]["multi"] = "line\nstring"
+
+    assert store == safe_load_lines(io.StringIO(code.getvalue()))
+
+    store.close()
+
+
+def test_safe_load_legacy_multiline_initial_data():
+    # Older versions logged the initial data with `pprint.pformat` over several lines.
+    code = (
+        "store = (\n"
+        "{'config': {'layers': [64, 32], 'lr': 0.1},\n"
+        " 'losses': [0, 1, 2, 3,\n"
+        "            4, 5],\n"
+        " 'names': {'name0': '', 'name1': '(', 'name2': '(('}}\n"
+        ")\n"
+        "store['losses'].append(6)\n"
+        "store['names']['name3']='((('\n"
+    )
+    expected = dict(
+        config=dict(layers=[64, 32], lr=0.1),
+        losses=list(range(7)),
+        names={f"name{i}": "(" * i for i in range(4)},
+    )
+
+    assert safe_load_str(code) == expected
+    assert safe_load_lines(io.StringIO(code)) == expected
+
+
+def test_scalar_collections_are_copied(mem_store):
+    store, code = mem_store
+    losses = [1, 2.0, "3", None]
+    config = dict(a=1, b=True)
+    store["losses"] = losses
+    store["config"] = config
+    losses.append(4)
+    config["c"] = 3
+
+    assert store["losses"] == [1, 2.0, "3", None]
+    assert store["config"] == dict(a=1, b=True)
+
+    # Linked store collections are copied, too.
+    store["losses_copy"] = store["losses"]
+    store["config_copy"] = store["config"]
+    store["losses"].append(5)
+    store["config"]["d"] = 4
+
+    assert store["losses_copy"] == [1, 2.0, "3", None]
+    assert store["config_copy"] == dict(a=1, b=True)
+    assert store == safe_load_str(code.getvalue())
+
+
+def test_initial_data_is_logged_as_single_statement(create_memory_store):
+    initial_data = dict(config=dict(lr=0.1, layers=[1, 2]), losses=[], tags={"a"})
+    store, code = create_memory_store(initial_data)
+
+    assert len(ast.parse(code.getvalue()).body) == 1
+    assert store == safe_load_str(code.getvalue())
+
+    store.close()
+
+
+def test_read_only_accessors(create_memory_store):
+    store, code = create_memory_store(dict(list=[1, 2, 2, 3], dict=dict(a=1)))
+
+    assert "dict" in store
+    assert store.get("missing", 5) == 5
+    assert list(store.keys()) == ["list", "dict"]
+    assert dict(store["dict"].items()) == dict(a=1)
+    assert list(store["dict"].values()) == [1]
+
+    assert 2 in store["list"]
+    assert list(store["list"]) == [1, 2, 2, 3]
+    assert list(reversed(store["list"])) == [3, 2, 2, 1]
+    assert store["list"].index(2) == 1
+    assert store["list"].count(2) == 2
+    with pytest.raises(ValueError):
+        store["list"].index(1, 1)
+
+    store.close()
+
+
+def test_close_is_idempotent():
+    code = io.StringIO()
+    store = Store(code)
+    store.close()
+    store.close()
+    assert code.closed
+
+
+def test_store_is_closed_when_leaving_with_block():
+    code = io.StringIO()
+    with pytest.raises(KeyError):
+        with Store(code, auto_flush=False) as store:
+            store.root["a"] = 1
+            raise KeyError("a")
+    assert code.closed
+
+
+def test_close_inside_with_block(tmp_path):
+    with open_file_store("test_close_inside_with", suffix="", prefix=f"{tmp_path}/", truncate=True) as store:
+        store["list"] = [1, 2]
+        store.close()
+
+    assert store == safe_load(f"{tmp_path}/test_close_inside_with.py")
+
+
+def test_coalesce_appends():
+    code = io.StringIO()
+    with Store(code, coalesce_appends=True) as raw_store:
+        store = raw_store.root
+        store["losses"] = []
+        store["other"] = []
+        for i in range(3000):
+            store["losses"].append(i / 3)
+        store["other"].append([1])
+        store["other"][0].append(2)
+        store["losses"].append(-0.0)
+        del store["losses"][0]
+        store["losses"].append(1)
+        store.flush()
+
+        assert len(code.getvalue().splitlines()) < 20
+        loaded = safe_load_str(code.getvalue())
+        assert store == loaded
+        assert repr(store) == repr(loaded)
+
+
+def test_safe_load_numeric_appends():
+    code = (
+        "store = {'losses': [], 'names': {}, 's': set()}\n"
+        "store['losses'].append(1)\n"
+        "store['losses'].append(-2.5e-3)\n"
+        "store['names']['x.append(1)'] = 0\n"
+        "store['s'].append(3)\n"
+    )
+    with pytest.raises(AttributeError):
+        safe_load_str(code)
+
+    code = code.replace("store['s'].append(3)\n", "store['losses'] = []\nstore['losses'].append(3)")
+    assert safe_load_str(code) == {"losses": [3], "names": {"x.append(1)": 0}, "s": set()}
+
+
+def test_unclosed_stores_are_flushed_at_exit(tmp_path):
+    store = open_file_store(
+        "test_flush_at_exit", suffix="", prefix=f"{tmp_path}/", truncate=True, auto_flush=False, coalesce_appends=True
+    )
+    store["losses"] = []
+    store["losses"].append(1)
+
+    laaos._flush_unflushed_stores()
+    assert store == safe_load(f"{tmp_path}/test_flush_at_exit.py")
+
+    store.close()
+    laaos._flush_unflushed_stores()
+
+
+def test_dropped_stores_are_flushed(tmp_path):
+    def log_losses():
+        store = open_file_store(
+            "test_dropped", suffix="", prefix=f"{tmp_path}/", truncate=True, auto_flush=False, coalesce_appends=True
+        )
+        store["losses"] = []
+        for i in range(10):
+            store["losses"].append(i)
+
+    log_losses()
+    gc.collect()
+
+    assert safe_load(f"{tmp_path}/test_dropped.py") == dict(losses=list(range(10)))
+
+
+def test_safe_load_logged_calls(create_memory_store):
+    store, code = create_memory_store(dict(names=[], tags=set()))
+    store["names"].append("a', 'b")
+    store["names"].append(None)
+    store["names"].append(("a", "b"))
+    store["names"].append("")
+    store["names"].append("it's")
+    store["names"].append("back\\slash\n")
+    store["tags"].add("x")
+    store["tags"].add(1.5)
+    store["tags"].discard("x")
+    store["x.append('y"] = []
+    store["x.append('y"].append(1)
+    store["names"][0] = "z"
+    store["counts"] = dict(a=[])
+    store["counts"]["a"].append(1)
+    store["counts"]["a"] = 2
+    store["counts"]["a]=['b"] = 3
+    store["counts"]["a"] = []
+    store["counts"]["a"].append(4)
+
+    loaded = safe_load_str(code.getvalue())
+    assert store == loaded
+    assert repr(store) == repr(loaded)
+
+    store.close()
+
+
+def test_file_store_is_utf8(tmp_path):
+    with open_file_store("test_utf8", suffix="", prefix=f"{tmp_path}/", truncate=True) as store:
+        store["name"] = "Größe ✓"
+
+    with open(f"{tmp_path}/test_utf8.py", "rb") as file:
+        assert "Größe ✓".encode("utf-8") in file.read()
+    assert store == safe_load(f"{tmp_path}/test_utf8.py")
+
+
+def test_nested_initial_data_round_trips(create_memory_store):
+    initial_data = dict(config=dict(model=dict(layers=[64, 32], dropout=0.5), seed=1), runs=[dict(id=1, tags={"a"})])
+    store, code = create_memory_store(initial_data)
+
+    assert code.getvalue().startswith("store = {")
+    assert safe_load_str(code.getvalue()) == initial_data
+
+    store.close()
+
+
+def test_lazily_linked_children(create_memory_store):
+    store, code = create_memory_store(dict(a=dict(b=[dict(c=[1])])))
+
+    c = store["a"]["b"][0]["c"]
+    c.append(2)
+    store["a"]["b"].insert(0, dict(c=[0]))
+    c.append(3)
+
+    # Assigning an ancestor copies the subtree, and the replaced child is no longer linked.
+    store["a"]["b"][1] = store["a"]
+    with pytest.raises(AssertionError):
+        c.append(4)
+
+    assert safe_load_str(code.getvalue()) == store
+
+    store.close()
+
+
+def test_numeric_appends_are_packed(create_memory_store):
+    store, code = create_memory_store(dict(losses=[], steps=[], mixed=[]))
+    for i in range(3):
+        store["losses"].append(i / 2)
+        store["steps"].append(i)
+    store["steps"].append(2**70)
+    store["mixed"].append(1)
+    store["mixed"].append(True)
+    store["mixed"].append(1.5)
+
+    # Slices of packed lists are lists, too.
+    assert store["losses"][1:3] == [0.5, 1.0]
+    assert store["losses"][-2:] == [0.5, 1.0]
+    assert type(store["losses"][:]) is list
+
+    assert store["losses"].index(0.5) == 1
+    assert store["steps"].index(1, 1, 3) == 1
+    with pytest.raises(ValueError):
+        store["steps"].index(0, 1)
+
+    store["losses"].insert(0, -1.0)
+
+    assert store["losses"] == [-1.0, 0.0, 0.5, 1.0]
+    assert store["steps"] == [0, 1, 2, 2**70]
+    assert repr(store["mixed"]) == "[1, True, 1.5]"
+    assert [type(value) for value in store["mixed"]] == [int, bool, float]
+    assert store == safe_load_str(code.getvalue())
+
+    store.close()
+
+
+def test_extend_is_logged_as_single_statement(create_memory_store):
+    store, code = create_memory_store(dict(losses=[], runs=[]))
+    store["losses"].extend(i / 2 for i in range(100))
+    store["losses"].extend([1, "a"])
+    store["losses"].extend([])
+    store["runs"].extend([dict(id=1), [2]])
+    store["runs"][0]["id"] = 3
+    store["runs"] += store["runs"]
+
+    assert len(code.getvalue().splitlines()) == 6
+    assert store["losses"] == [i / 2 for i in range(100)] + [1, "a"]
+    assert store["runs"] == [dict(id=3), [2], dict(id=3), [2]]
+    assert store == safe_load_str(code.getvalue())
+
+    store.close()